@@ -5,12 +5,17 @@ import glob
 import math
 import os
 import re
-import textwrap
+from enum import IntEnum
+from functools import lru_cache
+import numpy
 import PIL
-from PIL import Image, ImageDraw, ImageFont
+from PIL import Image, ImageColor, ImageDraw, ImageFont
 
+# '{color}' markup in caption text, for MulticolorText
+_COLOR_RE = re.compile(r'\{([^}]*)\}')
 
-class Side(object):
+
+class Side(IntEnum):
     """Enumeration for 'side' of an image."""
     # outer
     TOP, RIGHT, BOTTOM, LEFT = 1, 2, 3, 4
@@ -23,7 +28,66 @@ class Side(object):
         return v >= cls.NW
 
 
+# frequently-tested groups of sides, as constant-time sets
+_OUTER_TB = frozenset({Side.TOP, Side.BOTTOM})
+_OUTER_LR = frozenset({Side.LEFT, Side.RIGHT})
+_SOUTH_SIDES = frozenset({Side.S, Side.SE, Side.SW})
+
+
+def _normalize_color(color):
+    """Return the color as an RGBA 4-tuple.
+
+    Accepts anything Pillow does: a color name or hex string, or an
+    RGB(A) tuple. Normalizing once lets the rest of the class index
+    channels without re-checking the input form.
+    """
+    if isinstance(color, str):
+        color = ImageColor.getrgb(color)
+    color = tuple(color)
+    if len(color) == 3:
+        color += (255,)
+    return color
+
+
+@lru_cache(maxsize=None)
+def _font_dir_index(root):
+    """Walk one directory tree once, mapping font filename to full path."""
+    index = {}
+    for dirpath, _, filenames in os.walk(root, followlinks=False):
+        for fname in filenames:
+            index.setdefault(fname, os.path.join(dirpath, fname))
+    return index
+
+
+@lru_cache(maxsize=None)
+def _resolve_font(name, font_dirs, extensions):
+    """Find font file 'name.<ext>' in the given directory trees,
+    trying extensions in order.
+    """
+    targets = ['{n}.{e}'.format(n=name, e=ext) for ext in extensions]
+    for root in font_dirs:
+        index = _font_dir_index(root)
+        for target in targets:
+            path = index.get(target)
+            if path:
+                return path
+    return None
+
+
+@lru_cache(maxsize=32)
+def _get_font(path, size):
+    """Load a truetype font once per (path, size), with its line height.
+
+    Returns:
+        (font, line_height)
+    """
+    font = ImageFont.truetype(path, size)
+    bbox = font.getbbox('Ag')
+    return font, bbox[3] - bbox[1]
+
+
 class Fonts(object):
+    __slots__ = ('_fd',)
     default_font_dirs = ['/usr/share/fonts',
                          os.path.join(os.environ['HOME'], '.fonts')]
     extensions = ['ttf', 'otf', 'TTF', 'OTF']
@@ -38,25 +102,7 @@ class Fonts(object):
                                                                   p=paths)
 
     def find(self, name):
-        for d1 in self._fd:
-            path = self._find_name(d1, name)
-            if path:
-                return path
-            for d2 in os.listdir(d1):
-                d3 = os.path.join(d1, d2)
-                if os.path.isdir(d3):
-                    path = self._find_name(d3, name)
-                    if path:
-                        return path
-        return None
-
-    def _find_name(self, d, name):
-        # print('DBG: look for fonts in "{}"'.format(d))
-        for ext in self.extensions:
-            target = os.path.join(d, '{name}.{ext}'.format(name=name, ext=ext))
-            if os.path.exists(target):
-                return target
-        return None
+        return _resolve_font(name, tuple(self._fd), tuple(self.extensions))
 
 
 class CapImg(object):
@@ -72,6 +118,11 @@ class CapImg(object):
         finnish_kitties = cap.finish()
         finnish_kitties.save("finkitties.jpg")
     """
+    __slots__ = ('_base', '_text', '_side', '_padx', '_pady',
+                 '_shiftx', '_shifty', '_fill', '_bg', '_spc',
+                 '_font', '_line_h', '_font_spc',
+                 '_balloon', '_tailx', '_taily', '_bfill',
+                 '_bmargin', '_btransp', '_text_effect_stack', '_prep')
     default_padding = 5
     default_text_fill = (0, 0, 0, 255)
     default_text_bg = (255, 255, 255, 255)
@@ -91,22 +142,22 @@ class CapImg(object):
         """
         self._base = im
         self._text = []
+        self._prep = None
         self._side = side
         self._padx = padx
         self._pady = pady
         self._shiftx = shiftx
         self._shifty = shifty
-        self._fill = text_fill
-        self._bg = text_bg
+        self._fill = _normalize_color(text_fill)
+        self._bg = _normalize_color(text_bg)
         self._spc = space
-        self._words = None
         # find font
         fonts = Fonts()
         ffile = fonts.find(font)
         if ffile is None:
             raise ValueError('Cannot find font "{n}" in {f}'.format(
                 n=font, f=fonts))
-        self._font = ImageFont.truetype(ffile, font_size)
+        self._font, self._line_h = _get_font(ffile, font_size)
         self._font_spc = line_spacing
         if balloon and Side.is_inner(self._side):
             self._balloon = True
@@ -143,191 +194,282 @@ class CapImg(object):
             text (str): Text to add
         """
         self._text.append(text)
+        self._prep = None  # invalidate cached layout
 
-    def _wrap_text(self, w=0, h=0):
-        # calculate height/width of single character
-        draw = ImageDraw.Draw(Image.new('RGBA', (1000, 1000)))
-        fx, fy = draw.multiline_textsize("The quick 'fox' "
-                                         "jumps over the lazy dog.",
-                                         font=self._font,
-                                         spacing=self._font_spc)
-        fx /= 37
-        fy += 5
-        text = ' '.join(self._text).strip()
-        lines = []
+    def _wrap_text(self, text, w=0, h=0):
+        # line height from cached font metrics
+        fy = self._line_h + 5
+        lines, widths = [], None
         if w > 0:
-            # known width
-            wrap_width = w / fx
-            # wrap the text
-            lines = self._wrap(text, wrap_width)
+            # known width: pack greedily by measured pixel width
+            lines, widths = self._wrap_pixels(text, w)
         elif w == 0:
             if h < fy:
                 raise ValueError('Image too small to fit one'
                                  'line of text next to it')
-            # unknown width, need to calculate it
-            # start with perfect wrapping and expand out
-            n = len(text)
-            lines, max_lines = [], h // fy
-            wrap_width = max(n // max_lines, 8)
-            while wrap_width < n:
-                lines = self._wrap(text, wrap_width)
-                # print('@@ wrap_width={} lines={} max_lines={}'
-                #      .format(wrap_width, len(lines), max_lines))
-                if len(lines) <= max_lines and not self._broken_words(text,
-                                                                      lines):
-                    break
-                wrap_width += 1
-        # calculate dimensions
+            # unknown width, need to calculate it: "fits in max_lines"
+            # is monotonic in the pixel width, so bisect for the
+            # smallest feasible width
+            max_lines = h // fy
+            getlength = self._font.getlength
+            # no wrap narrower than the widest word keeps words whole
+            lo = int(math.ceil(max((getlength(wd) for wd in text.split()),
+                                   default=0)))
+            hi = int(math.ceil(getlength(text)))
+            while lo < hi:
+                mid = (lo + hi) // 2
+                if len(self._wrap_pixels(text, mid)[0]) <= max_lines:
+                    hi = mid
+                else:
+                    lo = mid + 1
+            lines, widths = self._wrap_pixels(text, lo)
+        # calculate dimensions from font metrics, without a scratch image,
+        # reusing widths measured while packing when available
         wrapped = '\n'.join(lines)
-        fx, fy = draw.multiline_textsize(wrapped, font=self._font)
+        if lines:
+            if widths is None:
+                widths = [self._font.getlength(ln) for ln in lines]
+            fx = int(math.ceil(max(widths)))
+            fy = (len(lines) * self._line_h +
+                  (len(lines) - 1) * self._font_spc)
+        else:
+            fx, fy = 0, 0
         return wrapped, (fx, fy)
 
-    def _wrap(self, text, width):
-        """Wrap text in paragraphs."""
-        if not self.paragraph_marker in text:
-            return textwrap.wrap(text, width)
-        lines = []
+    def _wrap_pixels(self, text, px_width):
+        """Wrap text in paragraphs, packing each line up to a pixel width
+        measured with the actual font.
+
+        Returns:
+            (list, list) Lines and their measured pixel widths
+        """
+        if not text:
+            return [], []
+        getlength = self._font.getlength
+        lines, widths = [], []
         for para in text.split(self.paragraph_marker):
             if para == '':
                 lines.append('')
-            else:
-                lines.extend(textwrap.wrap(para, width))
-        return lines
-
-    def _broken_words(self, text, lines):
-        if not self._words:
-            self._words = re.findall('\w+', text)
-            # print("@@ WORDS: {}".format(self._words))
-        w = 0
-        for line in lines:
-            line_words = re.findall('\w+', line)
-            for lw in line_words:
-                if self._words[w] != lw:
-                    # print('@@ bad line-word "{}" != next text word "{}"'
-                    # .format(lw, self._words[w]))
-                    return True
-                w += 1
-                if w == len(self._words):
-                    return False
-        return False
-
-    def finish(self):
-        """Finish the image by putting the caption on it.
-
-        Text box (which may be on any side of img) is
-        padded on top/bottom by 'pady' and left/right
-        by 'padx' pixels.
+                widths.append(0)
+                continue
+            cur, cur_w = '', 0
+            for word in para.split():
+                cand = word if not cur else cur + ' ' + word
+                cand_w = getlength(cand)
+                if cur and cand_w > px_width:
+                    lines.append(cur)
+                    widths.append(cur_w)
+                    cur, cur_w = word, getlength(word)
+                else:
+                    cur, cur_w = cand, cand_w
+            if cur:
+                lines.append(cur)
+                widths.append(cur_w)
+        return lines, widths
+
+    # Per-side layout: each returns (new_width, new_height, text_xoffs,
+    # text_yoffs, text_width, text_height, paste_box) for a base image
+    # of the given width and height
+
+    def _layout_top(self, bw, bh):
+        th = 0 if self._spc == 0 else self._spc - 2 * self._pady
+        return (bw, bh + self._spc, self._padx, self._pady,
+                bw - 2 * self._padx, th, (0, self._spc))
+
+    def _layout_bottom(self, bw, bh):
+        th = 0 if self._spc == 0 else self._spc - 2 * self._pady
+        return (bw, bh + self._spc, self._padx, bh + self._pady,
+                bw - 2 * self._padx, th, (0, 0))
+
+    def _layout_left(self, bw, bh):
+        tw = 0 if self._spc == 0 else self._spc - 2 * self._padx
+        return (bw + self._spc, bh, self._padx, self._pady,
+                tw, bh - 2 * self._pady, (self._spc, 0))
+
+    def _layout_right(self, bw, bh):
+        tw = 0 if self._spc == 0 else self._spc - 2 * self._padx
+        return (bw + self._spc, bh, bw + self._padx, self._pady,
+                tw, bh - 2 * self._pady, (0, 0))
+
+    def _layout_nw(self, bw, bh):
+        return (bw, bh, self._padx, self._pady,
+                bw // 2 - 2 * self._padx, bh // 2, (0, 0))
+
+    def _layout_ne(self, bw, bh):
+        hw = bw // 2
+        return (bw, bh, hw + self._padx, self._pady,
+                hw - 2 * self._padx, bh // 2, (0, 0))
+
+    def _layout_se(self, bw, bh):
+        hw, hh = bw // 2, bh // 2
+        return (bw, bh, self._padx + hw, bh - self._pady - hh,
+                hw - 2 * self._padx, hh, (0, 0))
+
+    def _layout_sw(self, bw, bh):
+        hh = bh // 2
+        return (bw, bh, self._padx, self._pady + hh,
+                bw // 2 - 2 * self._padx, hh, (0, 0))
+
+    def _layout_n(self, bw, bh):
+        return (bw, bh, self._padx, self._pady,
+                bw - 2 * self._padx, bh // 2 - 2 * self._pady, (0, 0))
+
+    def _layout_s(self, bw, bh):
+        return (bw, bh, self._padx, bh // 2 + self._pady,
+                bw - 2 * self._padx, bh // 2 - 2 * self._pady, (0, 0))
+
+    def _layout_w(self, bw, bh):
+        return (bw, bh, self._padx, self._pady,
+                bw // 2 - 2 * self._padx, bh - 2 * self._pady, (0, 0))
+
+    def _layout_e(self, bw, bh):
+        return (bw, bh, self._padx + bw // 2, self._pady,
+                bw // 2 - 2 * self._padx, bh - 2 * self._pady, (0, 0))
+
+    _LAYOUT = {Side.TOP: _layout_top, Side.BOTTOM: _layout_bottom,
+               Side.LEFT: _layout_left, Side.RIGHT: _layout_right,
+               Side.NW: _layout_nw, Side.NE: _layout_ne,
+               Side.SE: _layout_se, Side.SW: _layout_sw,
+               Side.N: _layout_n, Side.S: _layout_s,
+               Side.W: _layout_w, Side.E: _layout_e}
+
+    def prepare(self):
+        """Lay out the caption: wrap the text and compute where the
+        text and the base image go. None of this depends on the base
+        image's pixels, so it is done once and cached; `apply` can then
+        reuse it for every frame of an animation.
 
         Returns:
-            (Image) Captioned image
+            (dict) Cached layout
         """
+        text = ' '.join(self._text).strip()
+        if not text:
+            self._prep = {'text': None}
+            return self._prep
+        # hoist frequently-read attributes into locals
+        side = self._side
         base_width, base_height = self._base.size
-        text_xoffs, text_yoffs = 0, 0
-        if self._side in (Side.TOP, Side.BOTTOM):
-            text_width = base_width - 2 * self._padx
-            text_height = 0 if self._spc == 0 else self._spc - 2 * self._pady
-            new_width = base_width
-            new_height = self._base.size[1] + self._spc
-            text_xoffs = self._padx
-            if self._side == Side.TOP:
-                text_yoffs = self._pady
-            else:
-                text_yoffs = self._base.size[1] + self._pady
-            text_xoffs += self._shiftx
-            text_yoffs += self._shifty
-        elif self._side in (Side.LEFT, Side.RIGHT):
-            text_width = 0 if self._spc == 0 else self._spc - 2 * self._padx
-            text_height = self._base.size[1] - 2 * self._pady
-            new_width = base_width + self._spc
-            new_height = self._base.size[1]
-            text_yoffs = self._pady
-            if self._side == Side.LEFT:
-                text_xoffs = self._padx
-            else:
-                text_xoffs = base_width + self._padx
-            text_xoffs += self._shiftx
-            text_yoffs += self._shifty
-        elif self._side in (Side.NW, Side.NE, Side.SE, Side.SW):
-            new_width, new_height = base_width, base_height
-            text_width = base_width / 2 - 2 * self._padx
-            text_height = base_height / 2
-            if self._side == Side.NE:
-                text_xoffs = base_width / 2 + self._padx
-                text_yoffs = self._pady
-            elif self._side == Side.NW:
-                text_xoffs = self._padx
-                text_yoffs = self._pady
-            elif self._side == Side.SE:
-                text_xoffs = self._padx + base_width / 2
-                text_yoffs = base_height - self._pady - text_height
-            elif self._side == Side.SW:
-                text_xoffs = self._padx
-                text_yoffs = self._pady + base_height / 2
-            text_xoffs += self._shiftx
-            text_yoffs += self._shifty
-        elif self._side in (Side.N, Side.E, Side.W, Side.S):
-            new_width, new_height = base_width, base_height
-            if self._side in (Side.N, Side.S):
-                text_xoffs = self._padx
-                text_height = base_height / 2 - 2 * self._pady
-                text_width = base_width - 2 * self._padx
-                if self._side == Side.N:
-                    text_yoffs = self._pady
-                else:
-                    text_yoffs = base_height / 2 + self._pady
-            else:
-                text_yoffs = self._pady
-                text_width = base_width / 2 - 2 * self._padx
-                text_height = base_height - 2 * self._pady
-                if self._side == Side.W:
-                    text_xoffs = self._padx
-                else:
-                    text_xoffs = self._padx + base_width / 2
-            text_xoffs += self._shiftx
-            text_yoffs += self._shifty
-        else:
-            raise ValueError("size={} not understood".format(self._side))
-        wrapped_text, text_dim = self._wrap_text(w=text_width, h=text_height)
-        # auto-calculated text width or height
+        pad2x, pad2y = 2 * self._padx, 2 * self._pady
+        try:
+            layout = self._LAYOUT[side]
+        except KeyError:
+            raise ValueError("size={} not understood".format(side))
+        (new_width, new_height, text_xoffs, text_yoffs,
+         text_width, text_height, paste_box) = layout(self, base_width,
+                                                      base_height)
+        text_xoffs += self._shiftx
+        text_yoffs += self._shifty
+        wrapped_text, text_dim = self._wrap_text(text, w=text_width,
+                                                 h=text_height)
+        # auto-calculated text width or height; the base image shifts
+        # over by the same amount when the caption is above or left of it
         if self._spc == 0:
-            if self._side in (Side.TOP, Side.BOTTOM):
-                new_height += text_dim[1] + 2 * self._pady
-            elif self._side in (Side.LEFT, Side.RIGHT):
-                new_width += text_dim[0] + 2 * self._padx
-        bgcolor = self._bg
-        cp = Image.new(mode='RGBA', size=(new_width, new_height), color=bgcolor)
-        # paste original image back in
-        if self._side == Side.TOP:
-            cp.paste(self._base, (0, new_height - base_height))
-        elif self._side == Side.BOTTOM or self._side == Side.RIGHT:
-            cp.paste(self._base, (0, 0))
-        elif self._side == Side.LEFT:
-            cp.paste(self._base, (new_width - base_width, 0))
-        elif self._side in (
-        Side.NE, Side.NW, Side.N, Side.E, Side.W, Side.S, Side.SE, Side.SW):
-            cp.paste(self._base, (0, 0))
-        else:
-            raise ValueError('Bad value for side: {}'.format(self._side))
-        # get ready to draw text
-        if self._side in (Side.S, Side.SE, Side.SW):
-            text_yoffs += (base_height / 2) - text_dim[1] - 2 * self._pady
-        # draw box
+            if side in _OUTER_TB:
+                delta = text_dim[1] + pad2y
+                new_height += delta
+                if side == Side.TOP:
+                    paste_box = (paste_box[0], paste_box[1] + delta)
+            elif side in _OUTER_LR:
+                delta = text_dim[0] + pad2x
+                new_width += delta
+                if side == Side.LEFT:
+                    paste_box = (paste_box[0] + delta, paste_box[1])
+        if side in _SOUTH_SIDES:
+            text_yoffs += (base_height // 2) - text_dim[1] - pad2y
+        # rasterize balloon and text into one transparent overlay, so
+        # apply() only needs a single alpha_composite per frame
+        overlay = Image.new('RGBA', (new_width, new_height),
+                            (255, 255, 255, 0))
         if self._balloon:
             tp = self._bmargin
-            cp = self._draw_balloon(cp, text_xoffs - tp, text_yoffs - tp,
-                                   text_dim[0] + tp * 2, text_dim[1] + tp * 2,
-                                   self._tailx, self._taily)
-        # draw text
-        img = Image.new('RGBA', cp.size, (255,255,255,0))
-        draw = ImageDraw.Draw(img)
+            overlay = self._draw_balloon(overlay, text_xoffs - tp,
+                                         text_yoffs - tp,
+                                         text_dim[0] + tp * 2,
+                                         text_dim[1] + tp * 2,
+                                         self._tailx, self._taily)
+        draw = ImageDraw.Draw(overlay)
         for text_effect_class, kwargs in self._text_effect_stack:
             te = text_effect_class(draw, **kwargs)
             te.draw_text(text_xoffs, text_yoffs, wrapped_text,
                          font=self._font, fill=self._fill,
                          spacing=self._font_spc)
-        cp = Image.alpha_composite(cp, img)
+        # opaque colors on a base with no transparency of its own, with
+        # no balloon and no extra effects, can be composed in RGB,
+        # saving a channel of canvas memory and the alpha flattening
+        # on save
+        opaque = self._bg[3] == 255 and self._fill[3] == 255
+        base_opaque = ('A' not in self._base.getbands() and
+                       'transparency' not in self._base.info)
+        mode = 'RGB' if (opaque and base_opaque and not self._balloon and
+                         len(self._text_effect_stack) == 1) else 'RGBA'
+        # crop the overlay to the region actually drawn on, so each
+        # frame's composite only touches the caption area
+        bbox = overlay.getbbox()
+        if bbox:
+            overlay = overlay.crop(bbox)
+            overlay_pos = bbox[:2]
+        else:
+            overlay, overlay_pos = None, (0, 0)
+        self._prep = {'text': wrapped_text,
+                      'size': (new_width, new_height),
+                      'paste_box': paste_box,
+                      'overlay': overlay,
+                      'overlay_pos': overlay_pos,
+                      'mode': mode}
+        return self._prep
+
+    def apply(self, im):
+        """Put the prepared caption on one image, which must be the
+        same size as the base image given to the constructor.
+
+        Args:
+            im (Image): Image to caption (e.g. one animation frame)
+
+        Returns:
+            (Image) Captioned image
+        """
+        prep = self._prep if self._prep is not None else self.prepare()
+        # nothing to do for an empty caption
+        if prep['text'] is None:
+            return im.copy()
+        base_width, base_height = im.size
+        new_width, new_height = prep['size']
+        paste_x, paste_y = prep['paste_box']
+        mode = prep['mode']
+        nchan = len(mode)
+        # slice-assign through numpy: one memcpy instead of a pixel loop
+        arr = numpy.empty((new_height, new_width, nchan), dtype=numpy.uint8)
+        arr[:] = self._bg[:nchan]
+        # view the base pixels directly when no mode conversion is needed
+        if im.mode == mode:
+            base_arr = numpy.asarray(im)
+        else:
+            base_arr = numpy.asarray(im.convert(mode))
+        arr[paste_y:paste_y + base_height,
+            paste_x:paste_x + base_width] = base_arr
+        cp = Image.fromarray(arr, mode)
+        # composite the pre-rendered balloon + text overlay over just
+        # the caption region
+        overlay = prep['overlay']
+        if overlay is not None:
+            if mode == 'RGBA':
+                cp.alpha_composite(overlay, prep['overlay_pos'])
+            else:
+                cp.paste(overlay, prep['overlay_pos'], overlay)
         return cp
 
+    def finish(self):
+        """Finish the image by putting the caption on it.
+
+        Text box (which may be on any side of img) is
+        padded on top/bottom by 'pady' and left/right
+        by 'padx' pixels.
+
+        Returns:
+            (Image) Captioned image
+        """
+        return self.apply(self._base)
+
     def _draw_balloon(self, base, x, y, w, h, tx, ty):
         """Draw balloon around the text with tail to (tx, ty).
 
@@ -350,15 +492,10 @@ class CapImg(object):
         fill, wid = self._fill, 2
         # tail
         seg, seg_side = self._calc_tail(x, y, w, h, tx, ty)
-        if seg:
-            if self._bfill:
-                # draw filled polygon for tail
-                draw.polygon([seg[0], seg[1], (tx, ty)], fill=bg,
-                             outline=bg)
-            else:
-                # draw 2 lines for tail
-                for i in (0, 1):
-                    draw.line([seg[i], (tx, ty)], fill=fill, width=wid)
+        if seg and self._bfill:
+            # draw filled polygon for tail
+            draw.polygon([seg[0], seg[1], (tx, ty)], fill=bg,
+                         outline=bg)
         # calculate rounded corners
         if w > 50 and h > 50:
             rr_x, rr_y = 10, 10
@@ -372,41 +509,38 @@ class CapImg(object):
             # in the middle
             draw.rectangle((x, y + rr_y2, x + w, y + h - rr_y2), fill=bg)
             draw.rectangle((x + rr_x2, y, x + w - rr_x2, y + h), fill=bg)
-        else:
-            # 2 vertical lines
-            for xoffs in (0, w):
-                if (seg_side == Side.LEFT and xoffs == 0) or \
-                        (seg_side == Side.RIGHT and xoffs == w):
-                    vtx = [[(x + xoffs, y + rr_y2), (x + xoffs, seg[0][1])],
-                           [(x + xoffs, seg[1][1]), (x + xoffs, y - rr_y2 + h)]]
-                else:
-                    vtx = [[(x + xoffs, y + rr_y2), (x + xoffs, y - rr_y2 + h)]]
-                for v in vtx:
-                    draw.line(v, fill=fill, width=wid)
-            # 2 horizontal lines
-            for yoffs in (0, h):
-                if (seg_side == Side.TOP and yoffs == 0) or \
-                        (seg_side == Side.BOTTOM and yoffs == h):
-                    vtx = [[(x + rr_x2, y + yoffs), (seg[0][0], y + yoffs)],
-                           [(seg[1][0], y + yoffs), (x - rr_x2 + w, y + yoffs)]]
-                else:
-                    vtx = [[(x + rr_x2, y + yoffs), (x - rr_x2 + w, y + yoffs)]]
-                for v in vtx:
-                    draw.line(v, fill=fill, width=wid)
-        # 4 rounded corners
-        for xoffs, yoffs, sa in ((0, 0, 180),
-                                 (w - rr_x, 0, 270),
-                                 (w - rr_x, h - rr_y, 0),
-                                 (0, h - rr_y, 90)):
-            ea = (sa + 90) % 360
-            if self._bfill:
+            # 4 rounded corners
+            for xoffs, yoffs, sa in ((0, 0, 180),
+                                     (w - rr_x, 0, 270),
+                                     (w - rr_x, h - rr_y, 0),
+                                     (0, h - rr_y, 90)):
+                ea = (sa + 90) % 360
                 draw.pieslice((x + xoffs, y + yoffs,
                                x + xoffs + rr_x, y + yoffs + rr_y),
                               sa, ea, outline=bg, fill=bg)
-            else:
-                draw.arc((x + xoffs, y + yoffs,
-                          x + xoffs + rr_x, y + yoffs + rr_y),
-                         sa, ea, fill=fill)
+        elif seg is None:
+            # no tail: one call for outline and corners
+            draw.rounded_rectangle((x, y, x + w, y + h), radius=rr_x,
+                                   outline=fill, width=wid)
+        else:
+            # outline and tail as one closed path: walk the corners
+            # clockwise, detouring out to the tail point along the side
+            # the tail attaches to
+            vertices = [(x + rr_x2, y)]
+            if seg_side == Side.TOP:
+                vertices.extend([seg[0], (tx, ty), seg[1]])
+            vertices.extend([(x + w - rr_x2, y), (x + w, y + rr_y2)])
+            if seg_side == Side.RIGHT:
+                vertices.extend([seg[0], (tx, ty), seg[1]])
+            vertices.extend([(x + w, y + h - rr_y2), (x + w - rr_x2, y + h)])
+            if seg_side == Side.BOTTOM:
+                vertices.extend([seg[1], (tx, ty), seg[0]])
+            vertices.extend([(x + rr_x2, y + h), (x, y + h - rr_y2)])
+            if seg_side == Side.LEFT:
+                vertices.extend([seg[1], (tx, ty), seg[0]])
+            vertices.append((x, y + rr_y2))
+            draw.line(vertices + [vertices[0]], fill=fill, width=wid,
+                      joint='curve')
         # composite bubble onto image
         out = Image.alpha_composite(base, img)
         return out
@@ -417,20 +551,13 @@ class CapImg(object):
             seg, side = None, None
         else:
             tw, th = w // 8, h // 8  # tail width/height
-            # two lines through the bounding box, diagonally
-            m1, m2 = h / w, -h / w
-            b1 = y - m1 * x
-            b2 = y + h - m2 * x
-            # print('@@ m1={}, b1={} ;; m2={} b2={}'.format(
-            #    m1, b1, m2, b2))
-            # figure out where tail end is relative to 4 areas
-            # these 2 lines divide the plane into
-            l1_y = m1 * tx + b1
-            l1 = -1 if 1.0 * ty > l1_y else 1
-            l2_y = m2 * tx + b2
-            l2 = -1 if 1.0 * ty > l2_y else 1
-            # print('@@ tx={}, ty={}, l1_y={}, l2_y={} :: l1={} l2={}'.format(
-            #    tx, ty, l1_y, l2_y, l1, l2))
+            # two lines through the bounding box, diagonally; figure out
+            # where the tail end is relative to the 4 areas these lines
+            # divide the plane into, comparing cross-products in integer
+            # arithmetic instead of evaluating slope/intercept in floats
+            l1 = -1 if (ty - y) * w > h * (tx - x) else 1
+            l2 = -1 if (ty - y - h) * w > -h * (tx - x) else 1
+            # print('@@ tx={}, ty={} :: l1={} l2={}'.format(tx, ty, l1, l2))
             # with -1 for below and 1 for above, get coords
             # for two points defining line segment for start of tail
             if l1 > 0 and l2 > 0:  # top
@@ -506,7 +633,7 @@ class MulticolorText(BasicText):
                        font=None, fill=None, spacing=None):
         offset = (text_xoffs, text_yoffs)
         font_width, font_height = font.getsize('X')
-        pieces = re.split(r'\{([^}]*)\}', text)
+        pieces = _COLOR_RE.split(text)
         if len(pieces) == 1:
             self._img.multiline_text(offset, text, font=font,
                                      fill=fill, spacing=spacing)
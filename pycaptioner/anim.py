@@ -1,31 +1,50 @@
 """
 Functions for animated images.
 """
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import os
 import numpy
 
 
-def process_frames(img, func):
+def process_frames(img, func, max_workers=None):
     """Process an animated image, applying func() to each frame.
 
+    Frames are decoded sequentially (seeking is stateful) and handed
+    to a thread pool: the frames are independent and Pillow/numpy
+    release the GIL for the heavy compositing work. Only a bounded
+    window of frames is in flight at once -- decoding pauses while the
+    window is full, and finished frames are yielded in order -- so
+    memory use stays constant no matter how long the sequence is.
+
     Args:
         img (ImageSequence): Animated image (i.e. GIF)
         func: Function taking an Image and returning an Image
+        max_workers (int): Thread count, default chosen by the pool
 
-    Returns:
-        (list) List of numpy arrays that can be saved by imageio.mimsave()
+    Yields:
+        (numpy.ndarray) One processed frame
 
     """
-    sequence, frame_num = [], 0
-    while True:
-        try:
-            img.seek(frame_num)
-        except EOFError:
-            break
-        new_img = img.copy()
-        new_img.paste(img)
-        mod_img = func(new_img)
-        np_img = numpy.array(mod_img)
-        sequence.append(np_img)
-        frame_num += 1
-    return sequence
-
+    if max_workers is None:
+        # mirror the ThreadPoolExecutor default
+        max_workers = min(32, (os.cpu_count() or 1) + 4)
+    # enough submitted work to keep every thread busy without
+    # buffering the whole sequence
+    window = 2 * max_workers
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        frame_num = 0
+        while True:
+            try:
+                img.seek(frame_num)
+            except EOFError:
+                break
+            # one conversion promotes palette frames and copies the
+            # pixels, so the thread never touches the shared reader
+            pending.append(pool.submit(func, img.convert('RGBA')))
+            frame_num += 1
+            if len(pending) >= window:
+                yield numpy.asarray(pending.popleft().result())
+        while pending:
+            yield numpy.asarray(pending.popleft().result())
@@ -3,9 +3,10 @@ Command-line program functions
 """
 import argparse
 import sys
+from functools import lru_cache
 
 from PIL import Image, ImageColor
-from imageio import mimsave
+from imageio import get_writer
 
 from . import addtext, anim
 
@@ -19,62 +20,76 @@ class Caption(object):
              'w': addtext.Side.W, 's': addtext.Side.S,
              }
 
+    _parser = None
+
     def __init__(self):
+        self.p = self._get_parser()
+
+    @classmethod
+    def _get_parser(cls):
+        """Build the argument parser once, shared by all instances."""
+        if cls._parser is None:
+            cls._parser = cls._build_parser()
+        return cls._parser
+
+    @classmethod
+    def _build_parser(cls):
         default_pad = addtext.CapImg.default_padding
-        self.p = argparse.ArgumentParser(description="Add a caption to an image")
-        self.p.add_argument('inp', help='Input image file')
-        self.p.add_argument('out', help='Output image file')
-        self.p.add_argument('txt', help='Caption text. '
-                                        'Use \'-\' for standard input, '
-                                        '@filename for an input file.')
-        self.p.add_argument('-a', '--anim', help='Animated image',
-                            action='store_true', dest='anim')
-        self.p.add_argument('-b', '--background', help='Background color, for '
-                                                       'outside captions.',
-                            default=None, dest='bg')
-        self.p.add_argument('-c', '--color', help='Text color', default=None,
-                            dest='fg')
-        self.p.add_argument('-e', '--effect', action='append', dest='effects',
-                            default=[],
-                            help='Text effect (repeatable), use -E for help')
-        self.p.add_argument('-E', action='store_true', dest='show_effects',
-                            help='Show details on adding text effects')
-        self.p.add_argument('-f', '--font', help='Font name', dest='fname', default='arial')
-        self.p.add_argument('--hpad', dest='padh', type=int, default=default_pad,
-                            metavar='PX',
-                            help='Horizontal padding, in pixels (default=%(default)s)')
-        self.p.add_argument('--vpad', dest='padv', type=int, default=default_pad,
-                            metavar='PY',
-                            help='Vertical padding, in pixels (default=%(default)s)')
-        self.p.add_argument('--hshift', dest='shiftx', type=int, default=0,
-                            metavar='SX', help='Shift horizontal (ignored if'
-                                               'side is t, b, l, or r)'),
-        self.p.add_argument('--vshift', dest='shifty', type=int, default=0,
-                            metavar='SY', help='Shift vertical (ignored if'
-                                               'side is t, b, l, or r)')
-        self.p.add_argument('-l', '--line-spacing', dest='linespc', type=int,
-                            default=4, help='Line spacing (default=4)',
-                            metavar='POINTS')
-        self.p.add_argument('-r', '--reverse', dest='rev', action='store_true',
-                            help='White text on black background')
-        self.p.add_argument('-s', '--side', dest='side', default='b',
-                            help='Side of image to caption. Either '
-                                 'outside (t)op, (b)ottom, (l)eft, (r)ight, or '
-                                 'inside nw, ne, se, sw quadrant, or on '
-                                 '(n)orth, (e)ast, (w)est, or (s)outh side. '
-                                 'Default is (b)ottom.')
-        self.p.add_argument('-u', '--bubble', dest='bubble',
-                            metavar='COORD', default='',
-                            help='Add text bubble and tail. '
-                                 'Tail coordinates "<x>,<y>" in '
-                                 'pixels from origin in upper-left corner. '
-                                 'Optionally, add :<n> to create an internal '
-                                 'margin of <n> pixels (default=5). '
-                                 'Optionally, add "+" at end to fill bubble '
-                                 'with background color. After the "+" you '
-                                 'may add an integer 0-100 for transparency.')
-        self.p.add_argument('-z', '--font-size', dest='fsize', type=int, default=16,
-                            help='Font size, in points. Default is 16pt.')
+        p = argparse.ArgumentParser(description="Add a caption to an image")
+        p.add_argument('inp', help='Input image file')
+        p.add_argument('out', help='Output image file')
+        p.add_argument('txt', help='Caption text. '
+                                   'Use \'-\' for standard input, '
+                                   '@filename for an input file.')
+        p.add_argument('-a', '--anim', help='Animated image',
+                       action='store_true', dest='anim')
+        p.add_argument('-b', '--background', help='Background color, for '
+                                                  'outside captions.',
+                       default=None, dest='bg')
+        p.add_argument('-c', '--color', help='Text color', default=None,
+                       dest='fg')
+        p.add_argument('-e', '--effect', action='append', dest='effects',
+                       default=[],
+                       help='Text effect (repeatable), use -E for help')
+        p.add_argument('-E', action='store_true', dest='show_effects',
+                       help='Show details on adding text effects')
+        p.add_argument('-f', '--font', help='Font name', dest='fname', default='arial')
+        p.add_argument('--hpad', dest='padh', type=int, default=default_pad,
+                       metavar='PX',
+                       help='Horizontal padding, in pixels (default=%(default)s)')
+        p.add_argument('--vpad', dest='padv', type=int, default=default_pad,
+                       metavar='PY',
+                       help='Vertical padding, in pixels (default=%(default)s)')
+        p.add_argument('--hshift', dest='shiftx', type=int, default=0,
+                       metavar='SX', help='Shift horizontal (ignored if'
+                                          'side is t, b, l, or r)'),
+        p.add_argument('--vshift', dest='shifty', type=int, default=0,
+                       metavar='SY', help='Shift vertical (ignored if'
+                                          'side is t, b, l, or r)')
+        p.add_argument('-l', '--line-spacing', dest='linespc', type=int,
+                       default=4, help='Line spacing (default=4)',
+                       metavar='POINTS')
+        p.add_argument('-r', '--reverse', dest='rev', action='store_true',
+                       help='White text on black background')
+        p.add_argument('-s', '--side', dest='side', default='b',
+                       help='Side of image to caption. Either '
+                            'outside (t)op, (b)ottom, (l)eft, (r)ight, or '
+                            'inside nw, ne, se, sw quadrant, or on '
+                            '(n)orth, (e)ast, (w)est, or (s)outh side. '
+                            'Default is (b)ottom.')
+        p.add_argument('-u', '--bubble', dest='bubble',
+                       metavar='COORD', default='',
+                       help='Add text bubble and tail. '
+                            'Tail coordinates "<x>,<y>" in '
+                            'pixels from origin in upper-left corner. '
+                            'Optionally, add :<n> to create an internal '
+                            'margin of <n> pixels (default=5). '
+                            'Optionally, add "+" at end to fill bubble '
+                            'with background color. After the "+" you '
+                            'may add an integer 0-100 for transparency.')
+        p.add_argument('-z', '--font-size', dest='fsize', type=int, default=16,
+                       help='Font size, in points. Default is 16pt.')
+        return p
 
     def main(self, args):
         a = self.p.parse_args(args)
@@ -200,16 +215,18 @@ class Caption(object):
             else:
                 raise
 
+@lru_cache(maxsize=64)
 def _parse_color(s):
     result = ImageColor.getrgb(s)
     if len(result) == 3:
-        result = tuple(list(result) + [255])
+        result = result + (255,)
     #print('@@ parsed color: {}'.format(result))
     return result
 
 
 def caption_one(input_path, caption_text, output_path, options):
     image = Image.open(input_path)
+    image.load()  # one contiguous decode before compositing
     output_image = _add_caption(image, caption_text, options)
     do_convert = False
     for suffix in '.jpg', '.jpeg':
@@ -224,10 +241,14 @@ def caption_one(input_path, caption_text, output_path, options):
 
 def caption_sequence(input_path, caption_text, output_path, options):
     image = Image.open(input_path)
-    sequence = anim.process_frames(image,
-                                   lambda im: _add_caption(im, caption_text,
-                                                           options))
-    mimsave(output_path, sequence)
+    # lay out the caption once and reuse it for every frame
+    cap = addtext.CapImg(image, **options)
+    cap.addtext(caption_text)
+    cap.prepare()
+    # stream frames to the writer; only a bounded window is in flight
+    with get_writer(output_path, mode='I') as writer:
+        for frame in anim.process_frames(image, cap.apply):
+            writer.append_data(frame)
 
 
 def _add_caption(image, caption_text, options):